@@ -1,10 +1,20 @@
 import os
+import asyncio
+import aiohttp
 import discord
 import csv
 from discord.ext import commands, tasks
 from utils.RedditMonitor import RedditMonitor
-from utils.mosaic_maker import mosaic_maker
+from utils.mosaic_maker import mosaic_maker, imager_puller, image_fingerprints
 from utils.SB_connector import SupabaseConnector
+from utils.publish_outbox import PublishOutbox
+from utils.dedup_index import (
+    DuplicateIndex,
+    text_fingerprints,
+    is_media_url,
+    IMAGE,
+)
+from utils.payload_builder import PayloadBuilder, ATTACHMENT_LIMIT
 
 
 class RedditBotManager(commands.Bot):
@@ -54,6 +64,7 @@ class RedditBotManager(commands.Bot):
             self.reddit_monitor, self.supabase, self.post_channel
         )
         await self.add_cog(self.command_group)  # Add command group to the bot
+        await self.command_group.replay_outbox()  # Finish publishes cut by a crash
 
         # Initializing Reddit Monitor
         print("Initializing Reddit Monitor")
@@ -141,6 +152,13 @@ class CommandGroup(commands.Cog):
 
         self.published_posts = []
         self.authorised_channel = authorised_channel
+        self.outbox = PublishOutbox()
+        self.dedup_index = DuplicateIndex(
+            window_hours=float(os.getenv("DEDUP_WINDOW_HOURS", 72))
+        )
+        self.payloads = PayloadBuilder()
+        self.send_attempts = {}  # post_id -> failed sends so far
+        self.max_send_attempts = 3
 
     @commands.command(name="hello")
     async def hello(self, ctx):
@@ -181,15 +199,7 @@ class CommandGroup(commands.Cog):
         await ctx.send("Checking for new posts...")
         await self.reddit_monitor.get_posts()
 
-        # update processed post and post contents
-        self.reddit_monitor.processed_posts = set(
-            [
-                post
-                for post in self.reddit_monitor.processed_posts
-                if post not in self.posted_ids
-            ]
-        )
-
+        # drop content that was already published
         self.reddit_monitor.post_content = {
             post_id: content
             for post_id, content in self.reddit_monitor.post_content.items()
@@ -201,10 +211,15 @@ class CommandGroup(commands.Cog):
             await ctx.send("No new content to process.")
             return
 
-        await self.publish_content(self.reddit_monitor.post_content, ctx)
-        # repopulate the database_ids after it gets edited by publish_content
-        if self.supabase:
-            self.supabase.database_ids = self.supabase.get_post_ids()
+        failed = await self.publish_content(self.reddit_monitor.post_content, ctx)
+        # keep only posts whose send failed so the next check retries them
+        self.reddit_monitor.post_content = {
+            post_id: content
+            for post_id, content in self.reddit_monitor.post_content.items()
+            if post_id in failed
+        }
+        await self.reddit_monitor.save_processed_posts()
+        self.outbox.compact()
 
     async def publish_content(self, post_content: dict, ctx):
         """
@@ -215,7 +230,7 @@ class CommandGroup(commands.Cog):
             ctx: The context from which the command was invoked, providing the channel to send messages.
 
         Returns:
-            None
+            failed (list): IDs of posts whose send failed and should be retried.
 
         Raises:
             Any exceptions related to Discord API or content processing.
@@ -233,43 +248,246 @@ class CommandGroup(commands.Cog):
             await self.get_emoji_by_name(ctx, emoji_name)
             for emoji_name in emoji_name_list
         ]
+        self.published_posts = []
+        failed = []
         for post_id, content_str in post_content.items():
             if post_id not in self.posted_ids:
                 parsed_content = await self.parse_reddit_post(content_str)
                 if 'Link' not in list(parsed_content.keys()): # no link available; skip
                     continue
-                if "Images" in parsed_content:
-                    embedVar, attachment_file = await self.embed_gallery(parsed_content)
-                    if embedVar:
-                        message = await ctx.send(embed=embedVar, file=attachment_file)
+                entry = {
+                    "id": post_id,
+                    "title": parsed_content["Title"],
+                    "author": parsed_content["Author"],
+                }
+                message = None
+                # reuse the payload of an earlier failed send instead of re-rendering
+                payload = self.payloads.get(post_id)
+                if payload is None:
+                    payload = await self.build_payload(
+                        post_id, parsed_content, ctx.guild
+                    )
                 else:
-                    embedVar = await self.embed_post(parsed_content)
-                    if embedVar:
-                        message = await ctx.send(embed=embedVar)
+                    # a cross-post may have been published since the failed send
+                    duplicate_of = self.dedup_index.find_duplicate(payload.fingerprints)
+                    if duplicate_of:
+                        print(f"Skipping post {post_id}: duplicate of {duplicate_of}")
+                        self.payloads.drop(post_id)
+                        continue
+                if payload and self.outbox.is_pending(post_id):
+                    # an earlier send may have reached Discord without a reply
+                    sent = await self._find_sent_messages({parsed_content["Link"]})
+                    message = sent.get(parsed_content["Link"])
+                    if message:
+                        print(f"Recovering sent post {post_id} from channel history")
+                if payload and not message:
+                    self.outbox.mark_pending(
+                        entry, parsed_content["Link"], content_str, payload.fingerprints
+                    )
+                    try:
+                        message = await ctx.send(**payload.to_kwargs())
+                    except discord.HTTPException as e:
+                        print(f"Error sending post {post_id}: {e}")
+                        if e.status < 500:
+                            # rejected outright, so nothing was posted
+                            self.outbox.mark_failed(post_id)
+                            if e.status == 413 and self.payloads.shrink(post_id):
+                                print(f"Re-encoded attachment of post {post_id}")
+                        # on 5xx the record stays pending and the retry checks
+                        # the channel history first
+                        self._retry_later(post_id, failed)
+                        continue
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        print(f"Error sending post {post_id}: {e!r}")
+                        # the message may have been created; keep it pending
+                        self._retry_later(post_id, failed)
+                        continue
                 if message: #if post was succesfully posted
+                    self.outbox.mark_sent(post_id)
+                    self.payloads.confirm(post_id)
+                    self.send_attempts.pop(post_id, None)
+                    self._commit_post(entry)
+                    self.dedup_index.add(post_id, payload.fingerprints)
+                    self.published_posts.append(entry)
                     await self.add_reactions_to_message(message, emoji_list)
-                    self.published_posts.append(
-                        {
-                            "id": post_id,
-                            "title": parsed_content["Title"],
-                            "author": parsed_content["Author"],
-                        }
-                    )
+        return failed
+
+    def _retry_later(self, post_id: str, failed: list):
+        """
+        Count a failed send and queue the post for the next check.
+
+        The post stays in processed_posts; its content is kept in post_content
+        and its payload in the payload builder, so nothing is fetched again.
+        Once max_send_attempts is reached the post is given up on.
+
+        Args:
+            post_id (str): The Reddit post ID.
+            failed (list): IDs of posts to retry, appended to in place.
+
+        Returns:
+            None
+        """
+        self.send_attempts[post_id] = self.send_attempts.get(post_id, 0) + 1
+        if self.send_attempts[post_id] < self.max_send_attempts:
+            failed.append(post_id)
+            return
+        print(f"Giving up on post {post_id} after {self.max_send_attempts} attempts")
+        self.send_attempts.pop(post_id)
+        self.payloads.drop(post_id)
+        self.outbox.discard(post_id)
+
+    async def build_payload(self, post_id: str, parsed_content: dict, guild=None):
+        """
+        Render a post into a send payload, skipping duplicates.
+
+        Reposts and cross-posts are detected before anything is rendered.
+        The payload is kept by the payload builder until confirmed.
+
+        Args:
+            post_id (str): The Reddit post ID.
+            parsed_content (dict): The parsed content of the Reddit post.
+            guild: The guild the payload is sent to; its filesize_limit caps
+                the attachment size.
+
+        Returns:
+            payload: The SendPayload, or None if the post is a duplicate or
+                its embed could not be created.
+        """
+        fingerprints = text_fingerprints(
+            parsed_content["Title"], parsed_content["Link"], parsed_content["Author"]
+        )
+        images = None
+        if "Images" in parsed_content:
+            images = await imager_puller(parsed_content["Images"].split(" "))
+            fingerprints[IMAGE] = image_fingerprints(images)
+        elif is_media_url(parsed_content["Link"]):
+            # single image posts: re-uploads only match on the picture itself
+            fingerprints[IMAGE] = image_fingerprints(
+                await imager_puller([parsed_content["Link"]])
+            )
+        duplicate_of = self.dedup_index.find_duplicate(fingerprints)
+        if duplicate_of:
+            print(f"Skipping post {post_id}: duplicate of {duplicate_of}")
+            return None
+
+        attachment = None
+        if "Images" in parsed_content:
+            embedVar, attachment = await self.embed_gallery(parsed_content, images)
+        else:
+            embedVar = await self.embed_post(parsed_content)
+        if not embedVar:
+            return None
+        max_bytes = guild.filesize_limit if guild else ATTACHMENT_LIMIT
+        return self.payloads.build(
+            post_id, embedVar, attachment, fingerprints, max_bytes
+        )
+
+    def _commit_post(self, entry: dict):
+        """
+        Persist a sent post to the store and close its outbox record.
+
+        Args:
+            entry (dict): The post entry with "id", "title" and "author".
+
+        Returns:
+            None
+
+        Raises:
+            Any exceptions related to Supabase or file writing.
+        """
         if self.supabase:
-            self.supabase.insert_entries(self.published_posts)
+            self.supabase.insert_entry(entry)
+            self.posted_ids.append(entry["id"])
         else:
-            self.update_posted_ids()
+            self.update_posted_ids([entry])
+        self.outbox.mark_committed(entry["id"])
+
+    def _recover_post(self, entry: dict):
+        """
+        Commit a post found to be sent during replay and index its fingerprints.
+
+        Args:
+            entry (dict): The post entry with "id", "title" and "author".
+
+        Returns:
+            None
+        """
+        fingerprints = self.outbox.fingerprints(entry["id"])
+        self._commit_post(entry)
+        self.dedup_index.add(entry["id"], fingerprints)
 
-    async def embed_gallery(self, parsed_content: dict):
+    async def _find_sent_messages(self, links: set, history_limit: int = 50) -> dict:
+        """
+        Look up recent messages in the channel whose embed links to a post.
+
+        Args:
+            links (set): Post links to look for.
+            history_limit (int): Number of recent channel messages to search.
+
+        Returns:
+            sent (dict): Maps each link found to the message that carries it.
+        """
+        sent = {}
+        if not links or not self.authorised_channel:
+            return sent
+        async for message in self.authorised_channel.history(limit=history_limit):
+            for embed in message.embeds:
+                if embed.url in links:
+                    sent.setdefault(embed.url, message)
+        return sent
+
+    async def replay_outbox(self, history_limit: int = 50):
+        """
+        Finish any publish interrupted by a crash.
+
+        Posts that were sent but never committed are written to the store.
+        For posts whose send was never confirmed, the channel history is
+        searched for an embed linking to the post: if one exists the post is
+        committed, otherwise it is queued again like posts whose send failed.
+
+        Args:
+            history_limit (int): Number of recent channel messages to search.
+
+        Returns:
+            None
+        """
+        for entry in self.outbox.sent_entries():
+            if entry["id"] in self.posted_ids:
+                self.outbox.mark_committed(entry["id"])
+            else:
+                print(f"Recovering sent post {entry['id']} from outbox")
+                self._recover_post(entry)
+        pending = self.outbox.pending_entries()
+        sent_links = await self._find_sent_messages(
+            {entry["link"] for entry in pending}, history_limit
+        )
+        for entry in pending:
+            post_id = entry["id"]
+            if entry["link"] in sent_links:
+                print(f"Recovering sent post {post_id} from channel history")
+                self.outbox.mark_sent(post_id)
+                self._recover_post(
+                    {"id": post_id, "title": entry["title"], "author": entry["author"]}
+                )
+            else:
+                print(f"Retrying unconfirmed post {post_id} from outbox")
+                self.outbox.mark_failed(post_id)
+        # queue failed posts for the next check without fetching them again
+        for entry in self.outbox.failed_entries():
+            self.reddit_monitor.post_content[entry["id"]] = entry["content"]
+        self.outbox.compact()
+
+    async def embed_gallery(self, parsed_content: dict, images: list = None):
         """
         Create an embed for a gallery of images from a Reddit post.
 
         Args:
             parsed_content (dict): The parsed content from the Reddit post containing images.
+            images (list): Already fetched PIL images of the gallery, if any.
 
         Returns:
             embedVar: A Discord embed object.
-            composite_file: A Discord file object of the combined images, or None if no images.
+            composite: PNG bytes of the combined images, or None if no images.
 
         Raises:
             Any exceptions related to image processing.
@@ -293,13 +511,13 @@ class CommandGroup(commands.Cog):
         image_list = parsed_content["Images"].split(" ")
 
         # Fetch images and create a composite if necessary
-        buf = await mosaic_maker(image_list)
+        buf = await mosaic_maker(image_list, images)
         if buf:
-            composite_file = discord.File(buf, filename="combined.png")
+            composite = buf.getvalue()
             embedVar.set_image(url="attachment://combined.png")
         else:
-            composite_file = None
-        return embedVar, composite_file
+            composite = None
+        return embedVar, composite
 
     async def embed_post(self, parsed_content):
         """
@@ -417,9 +635,13 @@ class CommandGroup(commands.Cog):
                 ids = [row["id"] for row in reader]
         return ids
 
-    def update_posted_ids(self):
+    def update_posted_ids(self, posts: list = None):
         """
-        Update posted_ids.csv with the current published posts.
+        Append published posts to posted_ids.csv.
+
+        Args:
+            posts (list): Post entries to append. Defaults to the posts
+                published in the current cycle.
 
         Returns:
             None
@@ -430,6 +652,8 @@ class CommandGroup(commands.Cog):
         file_path = "posted_ids.csv"
         fieldnames = ["id", "title", "author"]
 
+        if posts is None:
+            posts = self.published_posts
         file_mode = "a" if os.path.exists(file_path) else "w"
 
         with open(file_path, mode=file_mode, newline="", encoding="utf-8") as file:
@@ -438,10 +662,12 @@ class CommandGroup(commands.Cog):
             if file_mode == "w":
                 writer.writeheader()
 
-            for post in self.published_posts:
+            for post in posts:
                 writer.writerow(
                     {"id": post["id"], "title": post["title"], "author": post["author"]}
                 )
+            file.flush()
+            os.fsync(file.fileno())
 
-        for post in self.published_posts:
+        for post in posts:
             self.posted_ids.append(post["id"])
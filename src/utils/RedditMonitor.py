@@ -1,8 +1,16 @@
 import os
+import re
+import time
 import asyncpraw
 import aiofiles
 from aiohttp import ClientSession
 from dotenv import load_dotenv
+from utils.query_planner import (
+    QueryPlanner,
+    MULTIREDDIT,
+    BATCHED_SEARCH,
+    PER_SUBREDDIT,
+)
 
 
 class RedditMonitor:
@@ -18,6 +26,12 @@ class RedditMonitor:
         self.subreddit_names = os.getenv("SUBREDDIT_NAME")
         self.target_flairs = os.getenv("TARGET_FLAIRS")
         self.flair_query = self._build_flair_query(self.target_flairs)
+        self.flair_matcher = self._build_flair_matcher(self.target_flairs)
+        self.search_limit = 2  # posts per subreddit, whatever the strategy
+        self.listing_limit = 25  # posts per subreddit scanned in combined listings
+        self.request_count = 0  # Reddit API requests in the current cycle
+        self.new_count = 0  # new flair-matching posts in the current cycle
+        self.planner = QueryPlanner(self._available_strategies())
 
     def _build_flair_query(self, flairs: str) -> str:
         """Build Reddit search query from flair list
@@ -32,6 +46,24 @@ class RedditMonitor:
             return escaped_flairs[0]
         return f"({' OR '.join(escaped_flairs)})"
 
+    def _build_flair_matcher(self, flairs: str):
+        """Compile a case-insensitive matcher for the flair list
+        comma separated str
+        """
+        if not flairs:
+            return None
+        alternatives = "|".join(re.escape(flair.strip()) for flair in flairs.split(","))
+        return re.compile(f"(?:{alternatives})", re.IGNORECASE)
+
+    def _available_strategies(self) -> list[str]:
+        """List the fetch strategies that make sense for this configuration."""
+        if not self.flair_query or len(self.subreddit_names.split(",")) == 1:
+            # without flairs per_subreddit reads each /new, so quiet subreddits
+            # aren't crowded out of the combined listing; with one subreddit a
+            # batched search is the per-subreddit search
+            return [MULTIREDDIT, PER_SUBREDDIT]
+        return [MULTIREDDIT, BATCHED_SEARCH, PER_SUBREDDIT]
+
     async def initialize(self):
         self.session = ClientSession(trust_env=True)
         self.reddit = asyncpraw.Reddit(
@@ -45,7 +77,21 @@ class RedditMonitor:
             },  # pass the custom Session instance
         )
 
-    async def get_subred(self, subreddit_name: str, flair_query: str, limit: int = 2):
+    async def get_subred(
+        self,
+        subreddit_name: str,
+        flair_query: str,
+        limit: int = 2,
+        flair_matcher: re.Pattern = None,
+        per_subreddit: int = None,
+    ):
+        """Fetch new posts from a subreddit or a multireddit ("a+b+c").
+
+        With a flair_query the posts come from Reddit search; without one they
+        come from /new, optionally filtered locally with flair_matcher.
+        per_subreddit keeps only the newest matching posts of each subreddit.
+        """
+        kept = {}  # subreddit -> matching posts kept so far
         if not self.reddit:
             await self.initialize()  # if reddit is not ready call initialization
         retries = 0
@@ -53,18 +99,30 @@ class RedditMonitor:
             try:
                 subreddit = await self.reddit.subreddit(subreddit_name)
                 if flair_query is None:
-                    reddit_query = subreddit.new(limit=2)
+                    reddit_query = subreddit.new(limit=limit)
                 else:
                     reddit_query = subreddit.search(
-                        query=self.flair_query,
+                        query=flair_query,
                         sort="new",
                         limit=limit,
                         time_filter="all",
                     )
+                # listings are fetched in pages of up to 100 posts
+                self.request_count += max(1, -(-limit // 100))
                 async for submission in reddit_query:
+                    if flair_matcher and not flair_matcher.fullmatch(
+                        (submission.link_flair_text or "").strip()
+                    ):
+                        continue
+                    if per_subreddit:
+                        name = submission.subreddit.display_name.lower()
+                        kept[name] = kept.get(name, 0) + 1
+                        if kept[name] > per_subreddit:
+                            continue
                     try:
                         # if the post is not in the proceessed post list
                         if submission.id not in self.processed_posts:
+                            self.new_count += 1
                             content = await self.get_post_content(submission)
                             if content is None:
                                 continue
@@ -82,15 +140,43 @@ class RedditMonitor:
                 break
 
     async def get_posts(self):
+        """Fetch new posts using the strategy picked by the query planner."""
         subreddit_list = self.subreddit_names.split(",")
-        if len(subreddit_list) == 1:
-            await self.get_subred(subreddit_list[0], self.flair_query)
+        multireddit = "+".join(subreddit_list)
+        strategy = self.planner.choose()
+        self.request_count = 0
+        self.new_count = 0
+        start = time.perf_counter()
+        # every strategy returns at most search_limit posts per subreddit; the
+        # combined listings read listing_limit posts per subreddit and keep the
+        # newest search_limit of each, so a busy subreddit can't take the
+        # quiet ones' share
+        combined_limit = self.listing_limit * len(subreddit_list)
+        if strategy == MULTIREDDIT:
+            await self.get_subred(
+                multireddit,
+                None,
+                limit=combined_limit,
+                flair_matcher=self.flair_matcher,
+                per_subreddit=self.search_limit,
+            )
+        elif strategy == BATCHED_SEARCH:
+            await self.get_subred(
+                multireddit,
+                self.flair_query,
+                limit=combined_limit,
+                per_subreddit=self.search_limit,
+            )
         else:
             for subreddit in subreddit_list:
-                # print(f"getting subreddit {subreddit};flairs {self.flair_query}")
-                await self.get_subred(subreddit, self.flair_query)
+                await self.get_subred(subreddit, self.flair_query, self.search_limit)
+        return self.planner.record(
+            strategy, self.request_count, time.perf_counter() - start, self.new_count
+        )
 
     async def get_post_content(self, submission):
+        if not getattr(submission, "_fetched", False):
+            self.request_count += 1
         await submission.load()
         content = f"**Title** {submission.title}\n"
         content += f"**Author** {submission.author}\n"
@@ -0,0 +1,246 @@
+import os
+import re
+import time
+import hashlib
+import numpy as np
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+# Fingerprint kinds stored in the index
+IMAGE = 0
+TITLE = 1
+URL = 2
+
+# Normalized titles shorter than this are too generic to dedup on
+MIN_TITLE_LENGTH = 20
+
+# Hosts serving static media, where the query only selects a size or signature
+MEDIA_HOSTS = {
+    "i.redd.it",
+    "preview.redd.it",
+    "external-preview.redd.it",
+    "i.imgur.com",
+}
+
+# Query parameters that only track where a link was shared from
+TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "si", "ref", "ref_src"}
+
+
+def _hash_text(text: str) -> int:
+    """Hash a normalized string into a 64-bit unsigned integer."""
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def normalize_title(title: str) -> str:
+    """
+    Normalize a post title for comparison.
+
+    Args:
+        title (str): The raw post title.
+
+    Returns:
+        str: The casefolded title with punctuation and extra spaces removed.
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", title.casefold()).split())
+
+
+def is_media_url(url: str) -> bool:
+    """Return whether a URL points straight at an image on a known media host."""
+    return urlsplit(url.strip()).netloc.lower() in MEDIA_HOSTS
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a post URL for comparison.
+
+    Scheme, "www.", fragment and trailing slash are dropped. The query string
+    is dropped for known media hosts, where it only selects a preview size;
+    elsewhere only tracking parameters are removed, since the query often
+    identifies the content (e.g. "watch?v=...").
+
+    Args:
+        url (str): The raw post URL.
+
+    Returns:
+        str: The normalized "host/path?query" string.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    normalized = f"{host}{parts.path.rstrip('/')}"
+    if host in MEDIA_HOSTS:
+        return normalized
+    params = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.startswith("utm_") and key not in TRACKING_PARAMS
+    )
+    if params:
+        normalized += f"?{urlencode(params)}"
+    return normalized
+
+
+def text_fingerprints(title: str, url: str, author: str) -> dict:
+    """
+    Build the title and URL fingerprints of a post.
+
+    The title is hashed together with the author, so a title only matches a
+    repost by the same user and never an unrelated post with the same wording.
+
+    Args:
+        title (str): The post title.
+        url (str): The post link.
+        author (str): The post author.
+
+    Returns:
+        dict: Maps TITLE/URL to a list of 64-bit hashes.
+    """
+    fingerprints = {TITLE: [], URL: []}
+    title = normalize_title(title or "")
+    if len(title) >= MIN_TITLE_LENGTH and author:
+        fingerprints[TITLE].append(_hash_text(f"{author.casefold()}\0{title}"))
+    if url:
+        fingerprints[URL].append(_hash_text(normalize_url(url)))
+    return fingerprints
+
+
+class DuplicateIndex:
+    """
+    Time-windowed index of post fingerprints backed by NumPy arrays.
+
+    Image hashes match when their Hamming distance is at most max_distance;
+    URL and author+title hashes must match exactly. Entries older than the window
+    are pruned on every insert.
+
+    Args:
+        window_hours (float): How long a published post blocks duplicates.
+        max_distance (int): Maximum differing bits for two image hashes to match.
+        file_path (str): Path of the .npz file the index is persisted to.
+    """
+
+    def __init__(
+        self,
+        window_hours: float = 72,
+        max_distance: int = 6,
+        file_path: str = "dedup_index.npz",
+    ):
+        self.window_seconds = window_hours * 3600
+        self.max_distance = max_distance
+        self.file_path = file_path
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.kinds = np.empty(0, dtype=np.uint8)
+        self.times = np.empty(0, dtype=np.float64)
+        self.post_ids = np.empty(0, dtype=np.str_)
+        self.load()
+
+    def find_duplicate(self, fingerprints: dict, now: float = None):
+        """
+        Look up a post's fingerprints in the index.
+
+        Args:
+            fingerprints (dict): Maps IMAGE/TITLE/URL to lists of 64-bit hashes.
+            now (float): Current timestamp; defaults to time.time().
+
+        Returns:
+            str: The ID of the post it duplicates, or None.
+        """
+        if now is None:
+            now = time.time()
+        recent = self.times >= now - self.window_seconds
+        for kind, values in fingerprints.items():
+            if not values:
+                continue
+            candidates = np.flatnonzero(recent & (self.kinds == kind))
+            if not candidates.size:
+                continue
+            query = np.asarray(values, dtype=np.uint64)[:, None]
+            stored = self.hashes[candidates][None, :]
+            if kind == IMAGE:
+                matches = np.bitwise_count(query ^ stored) <= self.max_distance
+            else:
+                matches = query == stored
+            hits = np.flatnonzero(matches.any(axis=0))
+            if hits.size:
+                return str(self.post_ids[candidates[hits[0]]])
+        return None
+
+    def add(self, post_id: str, fingerprints: dict, now: float = None):
+        """
+        Add a published post's fingerprints and persist the index.
+
+        Args:
+            post_id (str): The Reddit post ID.
+            fingerprints (dict): Maps IMAGE/TITLE/URL to lists of 64-bit hashes.
+            now (float): Current timestamp; defaults to time.time().
+
+        Returns:
+            None
+        """
+        if now is None:
+            now = time.time()
+        self.prune(now)
+        kinds = [kind for kind, values in fingerprints.items() for _ in values]
+        values = [value for values in fingerprints.values() for value in values]
+        if not values:
+            return
+        self.hashes = np.concatenate([self.hashes, np.asarray(values, dtype=np.uint64)])
+        self.kinds = np.concatenate([self.kinds, np.asarray(kinds, dtype=np.uint8)])
+        self.times = np.concatenate([self.times, np.full(len(values), now)])
+        self.post_ids = np.concatenate([self.post_ids, np.full(len(values), post_id)])
+        self.save()
+
+    def prune(self, now: float = None):
+        """
+        Drop fingerprints that fell out of the time window.
+
+        Args:
+            now (float): Current timestamp; defaults to time.time().
+
+        Returns:
+            None
+        """
+        if now is None:
+            now = time.time()
+        keep = self.times >= now - self.window_seconds
+        if keep.all():
+            return
+        self.hashes = self.hashes[keep]
+        self.kinds = self.kinds[keep]
+        self.times = self.times[keep]
+        self.post_ids = self.post_ids[keep]
+
+    def save(self):
+        """
+        Atomically write the index to its .npz file.
+
+        Returns:
+            None
+        """
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, mode="wb") as file:
+            np.savez(
+                file,
+                hashes=self.hashes,
+                kinds=self.kinds,
+                times=self.times,
+                post_ids=self.post_ids,
+            )
+        os.replace(tmp_path, self.file_path)
+
+    def load(self):
+        """
+        Load the index from its .npz file if it exists.
+
+        Returns:
+            None
+        """
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with np.load(self.file_path) as data:
+                self.hashes = data["hashes"]
+                self.kinds = data["kinds"]
+                self.times = data["times"]
+                self.post_ids = data["post_ids"]
+        except Exception as e:
+            print(f"Error loading dedup index:\n {e}")
+        self.prune()
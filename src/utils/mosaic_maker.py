@@ -1,4 +1,5 @@
 import aiohttp
+import numpy as np
 from PIL import Image
 from io import BytesIO
 import matplotlib.pyplot as plt
@@ -23,19 +24,60 @@ async def imager_puller(image_list: list[str]):
             async with session.get(url) as response:
                 if response.status == 200:
                     data = await response.read()
-                    img = Image.open(BytesIO(data))
+                    try:
+                        img = Image.open(BytesIO(data))
+                    except Exception as e:  # not an image, e.g. an HTML page
+                        print(f"Failed to read {url}: {e}")
+                        continue
                     images.append(img)
                 else:
                     print(f"Failed to fetch {url}")
         return images
 
 
-async def mosaic_maker(image_list: list[str]):
+def dhash(img: Image.Image, hash_size: int = 8) -> int:
+    """
+    Compute the difference hash (dHash) of an image.
+
+    The image is reduced to a (hash_size + 1) x hash_size grayscale thumbnail
+    and each bit records whether a pixel is brighter than its right neighbour,
+    so resized or re-encoded copies of the same picture hash within a few bits.
+
+    Args:
+        img (Image): The PIL image to hash.
+        hash_size (int): Number of rows/comparisons per row; 8 gives 64 bits.
+
+    Returns:
+        int: The hash as an unsigned integer.
+    """
+    thumb = img.convert("L").resize(
+        (hash_size + 1, hash_size), Image.Resampling.LANCZOS
+    )
+    pixels = np.asarray(thumb, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def image_fingerprints(images: list) -> list[int]:
+    """
+    Compute the perceptual hash of every image in a list.
+
+    Args:
+        images (list[Image]): PIL images, as returned by imager_puller.
+
+    Returns:
+        list[int]: One dHash per image.
+    """
+    return [dhash(img) for img in images]
+
+
+async def mosaic_maker(image_list: list[str], images: list = None):
     """
     Create a mosaic from a list of image URLs.
 
     Args:
         image_list (list[str]): List of image URLs.
+        images (list[Image]): Already fetched images; skips the download when given.
 
     Returns:
         BytesIO: A bytes buffer of the saved composite image.
@@ -43,7 +85,8 @@ async def mosaic_maker(image_list: list[str]):
     Raises:
         Exception: If there are no images provided.
     """
-    images = await imager_puller(image_list)
+    if images is None:
+        images = await imager_puller(image_list)
 
     if images:
         n = len(images)
@@ -83,3 +126,31 @@ async def mosaic_maker(image_list: list[str]):
         return buf
     else:
         return
+
+
+def fit_image(data: bytes, max_bytes: int) -> tuple[bytes, str]:
+    """
+    Re-encode an image so it fits within a size limit.
+
+    The image is returned untouched when it already fits. Otherwise it is
+    converted to JPEG at decreasing quality, then downscaled until it fits.
+
+    Args:
+        data (bytes): The encoded image.
+        max_bytes (int): Maximum allowed size in bytes.
+
+    Returns:
+        tuple[bytes, str]: The image data and its format extension ("png" or "jpg").
+    """
+    if len(data) <= max_bytes:
+        return data, "png"
+    img = Image.open(BytesIO(data)).convert("RGB")
+    while True:
+        for quality in (90, 80, 70, 60):
+            buf = BytesIO()
+            img.save(buf, format="JPEG", quality=quality, optimize=True)
+            if buf.tell() <= max_bytes:
+                return buf.getvalue(), "jpg"
+        if img.width == 1 and img.height == 1:  # can't shrink any further
+            return buf.getvalue(), "jpg"
+        img = img.resize((max(1, img.width * 3 // 4), max(1, img.height * 3 // 4)))
@@ -0,0 +1,206 @@
+import discord
+from io import BytesIO
+from utils.mosaic_maker import fit_image
+
+# Discord embed limits (characters)
+EMBED_TITLE_LIMIT = 256
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBED_TOTAL_LIMIT = 6000
+
+# Discord attachment limit (bytes) when the guild's own limit is unknown
+ATTACHMENT_LIMIT = 8 * 1024 * 1024
+
+
+def _truncate(text: str, limit: int) -> str:
+    """Cut text down to limit characters, marking the cut with an ellipsis."""
+    if len(text) <= limit:
+        return text
+    return text[: limit - 1] + "…"
+
+
+def _embed_length(embed: dict) -> int:
+    """Count the characters Discord adds up against EMBED_TOTAL_LIMIT."""
+    length = len(embed.get("title", "")) + len(embed.get("description", ""))
+    length += len(embed.get("footer", {}).get("text", ""))
+    length += len(embed.get("author", {}).get("name", ""))
+    for field in embed.get("fields", []):
+        length += len(field.get("name", "")) + len(field.get("value", ""))
+    return length
+
+
+def fit_embed(embed: dict) -> dict:
+    """
+    Truncate a serialized embed so it passes Discord's length checks.
+
+    The title and description are cut to their own limits. If the embed is
+    still over the total limit, the description gives up the difference and
+    trailing fields are dropped after that.
+
+    Args:
+        embed (dict): The embed as returned by discord.Embed.to_dict().
+
+    Returns:
+        dict: The same dict, truncated in place.
+    """
+    if "title" in embed:
+        embed["title"] = _truncate(embed["title"], EMBED_TITLE_LIMIT)
+    if "description" in embed:
+        embed["description"] = _truncate(embed["description"], EMBED_DESCRIPTION_LIMIT)
+        excess = _embed_length(embed) - EMBED_TOTAL_LIMIT
+        if excess > 0:
+            room = max(len(embed["description"]) - excess, 1)
+            embed["description"] = _truncate(embed["description"], room)
+    while embed.get("fields") and _embed_length(embed) > EMBED_TOTAL_LIMIT:
+        embed["fields"].pop()
+    return embed
+
+
+class SendPayload:
+    """
+    A post serialized once into everything needed to send it.
+
+    The attachment is kept as immutable bytes, and every call to to_kwargs
+    wraps it in a fresh discord.File, so the same payload can be retried or
+    sent to several channels without re-rendering or copying it.
+
+    Args:
+        post_id (str): The Reddit post ID.
+        embed (dict): The serialized embed.
+        attachment (bytes): The attachment data, or None.
+        filename (str): The attachment filename, or None.
+        fingerprints (dict): Content fingerprints to index once the send is confirmed.
+    """
+
+    __slots__ = ("post_id", "embed", "attachment", "filename", "fingerprints")
+
+    def __init__(
+        self,
+        post_id: str,
+        embed: dict,
+        attachment: bytes = None,
+        filename: str = None,
+        fingerprints: dict = None,
+    ):
+        self.post_id = post_id
+        self.embed = embed
+        self.attachment = attachment
+        self.filename = filename
+        self.fingerprints = fingerprints
+
+    def to_kwargs(self) -> dict:
+        """
+        Build the keyword arguments for a send call.
+
+        Returns:
+            dict: "embed" and, when there is an attachment, "file".
+        """
+        kwargs = {"embed": discord.Embed.from_dict(self.embed)}
+        if self.attachment is not None:
+            # BytesIO shares the bytes buffer until written to, so no copy is made
+            kwargs["file"] = discord.File(
+                BytesIO(self.attachment), filename=self.filename
+            )
+        return kwargs
+
+
+class PayloadBuilder:
+    """
+    Build send payloads and keep them until their send is confirmed.
+
+    Args:
+        max_pending (int): Maximum number of unconfirmed payloads kept; the
+            oldest is dropped beyond that.
+    """
+
+    def __init__(self, max_pending: int = 50):
+        self.max_pending = max_pending
+        self.pending: dict = {}  # post_id -> SendPayload
+
+    def get(self, post_id: str):
+        """Return the unconfirmed payload of a post, or None."""
+        return self.pending.get(post_id)
+
+    def build(
+        self,
+        post_id: str,
+        embed: discord.Embed,
+        attachment: bytes = None,
+        fingerprints: dict = None,
+        max_attachment_bytes: int = ATTACHMENT_LIMIT,
+    ) -> SendPayload:
+        """
+        Serialize a post and keep it until confirm is called.
+
+        The embed is truncated to Discord's limits and an oversized attachment
+        is re-encoded to fit instead of failing the send.
+
+        Args:
+            post_id (str): The Reddit post ID.
+            embed (discord.Embed): The embed to send. An attachment is expected
+                to be referenced as "attachment://combined.png".
+            attachment (bytes): PNG data to attach, or None.
+            fingerprints (dict): Content fingerprints of the post.
+            max_attachment_bytes (int): Attachment size limit of the target
+                guild, i.e. Guild.filesize_limit.
+
+        Returns:
+            SendPayload: The payload ready to send.
+        """
+        embed_dict = fit_embed(embed.to_dict())
+        filename = None
+        if attachment is not None:
+            attachment, extension = fit_image(attachment, max_attachment_bytes)
+            filename = f"combined.{extension}"
+            embed_dict["image"] = {"url": f"attachment://{filename}"}
+        payload = SendPayload(post_id, embed_dict, attachment, filename, fingerprints)
+        self.pending[post_id] = payload
+        if len(self.pending) > self.max_pending:
+            del self.pending[next(iter(self.pending))]
+        return payload
+
+    def shrink(self, post_id: str) -> bool:
+        """
+        Re-encode a payload's attachment to half its size.
+
+        Used when Discord rejects the attachment as too large even though it
+        fit the guild's reported limit.
+
+        Args:
+            post_id (str): The Reddit post ID.
+
+        Returns:
+            bool: Whether there was an attachment to shrink.
+        """
+        payload = self.pending.get(post_id)
+        if payload is None or payload.attachment is None:
+            return False
+        payload.attachment, extension = fit_image(
+            payload.attachment, len(payload.attachment) // 2
+        )
+        payload.filename = f"combined.{extension}"
+        payload.embed["image"] = {"url": f"attachment://{payload.filename}"}
+        return True
+
+    def confirm(self, post_id: str):
+        """
+        Release the payload of a post once its send succeeded.
+
+        Args:
+            post_id (str): The Reddit post ID.
+
+        Returns:
+            None
+        """
+        self.pending.pop(post_id, None)
+
+    def drop(self, post_id: str):
+        """
+        Forget the payload of a post that will not be sent.
+
+        Args:
+            post_id (str): The Reddit post ID.
+
+        Returns:
+            None
+        """
+        self.pending.pop(post_id, None)
@@ -0,0 +1,197 @@
+import os
+import json
+
+
+class PublishOutbox:
+    """
+    Write-ahead log tracking the publish state of each Reddit post.
+
+    Every state change is appended to a JSON lines file and fsynced before the
+    caller moves on, so a crash at any point leaves a record of what was about
+    to be sent, what was sent and what was already committed to the store.
+
+    States:
+        pending: the post is about to be sent to Discord.
+        sent: the Discord send succeeded, the store has not been updated yet.
+        failed: Discord rejected the send; the post is retried on a later check.
+        committed: the post is recorded in Supabase / posted_ids.csv.
+        discarded: the post will not be sent (anymore).
+
+    Args:
+        file_path (str): Path of the outbox log file.
+    """
+
+    def __init__(self, file_path: str = "publish_outbox.jsonl"):
+        self.file_path = file_path
+        self.entries: dict = {}  # post_id -> latest non-committed record
+        self._load()
+
+    def _load(self):
+        """
+        Rebuild the in-memory state from the outbox log.
+
+        Returns:
+            None
+        """
+        if not os.path.exists(self.file_path):
+            return
+        torn = False
+        with open(self.file_path, mode="r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # a torn final line from a crash mid-write; ignore it
+                    torn = True
+                    continue
+                if record["state"] in ("committed", "discarded"):
+                    self.entries.pop(record["id"], None)
+                else:
+                    self.entries[record["id"]] = record
+        if torn:
+            # rewrite the log so new records don't get appended to the torn line
+            self.compact()
+
+    def _append(self, record: dict):
+        """
+        Durably append a record to the outbox log.
+
+        Args:
+            record (dict): The record to write.
+
+        Returns:
+            None
+        """
+        with open(self.file_path, mode="a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def mark_pending(
+        self, entry: dict, link: str, content: str, fingerprints: dict = None
+    ):
+        """
+        Record that a post is about to be sent.
+
+        Args:
+            entry (dict): The post entry with "id", "title" and "author".
+            link (str): The post link, used to find the message after a crash.
+            content (str): The raw post content, used to retry after a restart.
+            fingerprints (dict): Content fingerprints, indexed once the post
+                is recovered after a crash.
+
+        Returns:
+            None
+        """
+        record = {
+            **entry,
+            "link": link,
+            "content": content,
+            # JSON object keys are strings; fingerprints() turns them back
+            "fingerprints": {str(kind): v for kind, v in (fingerprints or {}).items()},
+            "state": "pending",
+        }
+        self._append(record)
+        self.entries[entry["id"]] = record
+
+    def mark_sent(self, post_id: str):
+        """
+        Record that a post was successfully sent to Discord.
+
+        Args:
+            post_id (str): The Reddit post ID.
+
+        Returns:
+            None
+        """
+        record = {**self.entries[post_id], "state": "sent"}
+        self._append(record)
+        self.entries[post_id] = record
+
+    def mark_failed(self, post_id: str):
+        """
+        Record that Discord rejected a send that will be retried.
+
+        Args:
+            post_id (str): The Reddit post ID.
+
+        Returns:
+            None
+        """
+        record = {**self.entries[post_id], "state": "failed"}
+        self._append(record)
+        self.entries[post_id] = record
+
+    def mark_committed(self, post_id: str):
+        """
+        Record that a post was persisted to the store.
+
+        Args:
+            post_id (str): The Reddit post ID.
+
+        Returns:
+            None
+        """
+        self._append({"id": post_id, "state": "committed"})
+        self.entries.pop(post_id, None)
+
+    def discard(self, post_id: str):
+        """
+        Drop a post that will not be sent.
+
+        Args:
+            post_id (str): The Reddit post ID.
+
+        Returns:
+            None
+        """
+        self._append({"id": post_id, "state": "discarded"})
+        self.entries.pop(post_id, None)
+
+    def fingerprints(self, post_id: str) -> dict:
+        """Return the content fingerprints recorded for a post."""
+        stored = self.entries.get(post_id, {}).get("fingerprints", {})
+        return {int(kind): values for kind, values in stored.items()}
+
+    def is_pending(self, post_id: str) -> bool:
+        """Return whether a post has a send that was never confirmed."""
+        return self.entries.get(post_id, {}).get("state") == "pending"
+
+    def sent_entries(self) -> list:
+        """Return the posts that were sent but not yet committed."""
+        return [
+            {"id": r["id"], "title": r["title"], "author": r["author"]}
+            for r in self.entries.values()
+            if r["state"] == "sent"
+        ]
+
+    def pending_entries(self) -> list:
+        """Return the posts, with link and content, whose send was never confirmed."""
+        return [
+            {key: r[key] for key in ("id", "title", "author", "link", "content")}
+            for r in self.entries.values()
+            if r["state"] == "pending"
+        ]
+
+    def failed_entries(self) -> list:
+        """Return the posts, with their content, waiting for a retry."""
+        return [
+            {key: r[key] for key in ("id", "content")}
+            for r in self.entries.values()
+            if r["state"] == "failed"
+        ]
+
+    def compact(self):
+        """
+        Rewrite the log keeping only the outstanding records.
+
+        Returns:
+            None
+        """
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as file:
+            for record in self.entries.values():
+                file.write(json.dumps(record) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.file_path)
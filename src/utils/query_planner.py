@@ -0,0 +1,84 @@
+# Fetch strategies
+MULTIREDDIT = "multireddit"  # one /new listing over a+b+c, flairs matched locally
+BATCHED_SEARCH = "batched_search"  # one flair search over a+b+c
+PER_SUBREDDIT = "per_subreddit"  # one flair search per subreddit
+
+# Seconds of rate-limit budget a single request costs (OAuth allows ~100/minute)
+REQUEST_COST_SECONDS = 0.6
+
+
+class QueryPlanner:
+    """
+    Pick the cheapest way to fetch posts based on measured cost.
+
+    All strategies return the same posts (the newest few per subreddit), so
+    only how they are fetched differs. Every strategy is tried once, then the
+    one with the lowest cost is used. The cost of a cycle is its wall time
+    plus its request count weighted by REQUEST_COST_SECONDS, smoothed with an
+    exponential moving average. New posts are reported but not scored: which
+    strategy sees them depends on when it runs, not on how it fetches. Every
+    explore_every cycles the least recently measured strategy is re-run so the
+    estimates follow Reddit's behaviour.
+
+    Args:
+        strategies (list[str]): The strategies that apply to this configuration.
+        explore_every (int): How often, in cycles, to re-measure a strategy.
+        smoothing (float): Weight of the newest measurement in the average.
+    """
+
+    def __init__(
+        self, strategies: list[str], explore_every: int = 20, smoothing: float = 0.3
+    ):
+        self.strategies = list(strategies)
+        self.explore_every = explore_every
+        self.smoothing = smoothing
+        self.costs: dict = {}  # strategy -> smoothed cost of a cycle
+        self.last_used: dict = {}  # strategy -> cycle it was last measured
+        self.cycle = 0
+        self.last_report: dict = {}
+
+    def choose(self) -> str:
+        """
+        Pick the strategy for the next cycle.
+
+        Returns:
+            str: One of the configured strategies.
+        """
+        self.cycle += 1
+        for strategy in self.strategies:
+            if strategy not in self.costs:
+                return strategy
+        if self.cycle % self.explore_every == 0:
+            return min(self.strategies, key=lambda s: self.last_used[s])
+        return min(self.strategies, key=lambda s: self.costs[s])
+
+    def record(self, strategy: str, requests: int, elapsed: float, new_posts: int):
+        """
+        Record the measured cost of a cycle and report it.
+
+        Args:
+            strategy (str): The strategy that was run.
+            requests (int): Number of Reddit API requests made.
+            elapsed (float): Wall time of the cycle in seconds.
+            new_posts (int): Number of flair-matching posts not seen before;
+                only reported.
+
+        Returns:
+            dict: The report for this cycle.
+        """
+        cost = elapsed + requests * REQUEST_COST_SECONDS
+        if strategy in self.costs:
+            cost = self.smoothing * cost + (1 - self.smoothing) * self.costs[strategy]
+        self.costs[strategy] = cost
+        self.last_used[strategy] = self.cycle
+        self.last_report = {
+            "strategy": strategy,
+            "requests": requests,
+            "new_posts": new_posts,
+            "elapsed": elapsed,
+        }
+        print(
+            f"Query plan: {strategy} ({requests} requests, {new_posts} new posts, "
+            f"{elapsed:.2f}s)"
+        )
+        return self.last_report
@@ -0,0 +1,96 @@
+from utils.dedup_index import (
+    IMAGE,
+    TITLE,
+    URL,
+    DuplicateIndex,
+    is_media_url,
+    normalize_url,
+    text_fingerprints,
+)
+
+HOUR = 3600
+NOW = 1_700_000_000.0
+
+
+def make_index(tmp_path, **kwargs):
+    return DuplicateIndex(file_path=str(tmp_path / "dedup.npz"), **kwargs)
+
+
+def test_normalize_url_keeps_identifying_query():
+    assert normalize_url("https://youtube.com/watch?v=abc") != normalize_url(
+        "https://youtube.com/watch?v=xyz"
+    )
+    assert normalize_url("https://example.com/article.php?id=1") != normalize_url(
+        "https://example.com/article.php?id=2"
+    )
+
+
+def test_normalize_url_drops_tracking_params_scheme_and_www():
+    assert normalize_url(
+        "https://www.example.com/watch/?utm_source=x&v=abc&fbclid=y#top"
+    ) == normalize_url("http://example.com/watch?v=abc")
+
+
+def test_normalize_url_drops_query_for_media_hosts():
+    assert (
+        normalize_url("https://preview.redd.it/abc.jpg?width=640&s=123")
+        == "preview.redd.it/abc.jpg"
+    )
+    assert normalize_url("https://i.imgur.com/x.png?1") == "i.imgur.com/x.png"
+
+
+def test_title_only_matches_same_author():
+    title = "First harvest of the season!"
+    alice = text_fingerprints(title, None, "alice")
+    bob = text_fingerprints(title, None, "bob")
+    assert alice[TITLE] and alice[TITLE] != bob[TITLE]
+    assert text_fingerprints(title, None, "Alice")[TITLE] == alice[TITLE]
+
+
+def test_short_titles_are_not_fingerprinted():
+    assert text_fingerprints("Dinner", "https://i.redd.it/a.jpg", "alice")[TITLE] == []
+
+
+def test_image_hashes_match_within_hamming_distance(tmp_path):
+    index = make_index(tmp_path, max_distance=6)
+    index.add("p1", {IMAGE: [0b1111]}, now=NOW)
+
+    assert index.find_duplicate({IMAGE: [0b1110]}, now=NOW) == "p1"
+    assert index.find_duplicate({IMAGE: [0b1111 << 20]}, now=NOW) is None
+    # any image of a gallery is enough
+    assert index.find_duplicate({IMAGE: [2**63, 0b0111]}, now=NOW) == "p1"
+
+
+def test_text_hashes_match_exactly_and_by_kind(tmp_path):
+    index = make_index(tmp_path)
+    index.add("p1", {URL: [42]}, now=NOW)
+
+    assert index.find_duplicate({URL: [42]}, now=NOW) == "p1"
+    assert index.find_duplicate({URL: [43]}, now=NOW) is None
+    assert index.find_duplicate({IMAGE: [42]}, now=NOW) is None
+
+
+def test_entries_expire_after_window(tmp_path):
+    index = make_index(tmp_path, window_hours=1)
+    index.add("p1", {URL: [42]}, now=NOW)
+
+    assert index.find_duplicate({URL: [42]}, now=NOW + 0.5 * HOUR) == "p1"
+    assert index.find_duplicate({URL: [42]}, now=NOW + 2 * HOUR) is None
+    index.add("p2", {URL: [7]}, now=NOW + 2 * HOUR)
+    assert list(index.post_ids) == ["p2"]
+
+
+def test_index_survives_reload(tmp_path):
+    index = make_index(tmp_path, window_hours=10**6)
+    index.add("abc123", {IMAGE: [2**63 + 5], URL: [9]})
+
+    reloaded = make_index(tmp_path, window_hours=10**6)
+    assert reloaded.find_duplicate({IMAGE: [2**63 + 4]}) == "abc123"
+    assert reloaded.find_duplicate({URL: [9]}) == "abc123"
+
+
+def test_is_media_url_only_matches_direct_image_hosts():
+    assert is_media_url("https://i.redd.it/abc.jpg")
+    assert is_media_url("https://i.imgur.com/x.png")
+    assert not is_media_url("https://www.reddit.com/gallery/abc")
+    assert not is_media_url("https://youtube.com/watch?v=abc")
@@ -0,0 +1,48 @@
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from utils.mosaic_maker import dhash, fit_image
+
+
+def noise_image(seed, size=(400, 300)):
+    rng = np.random.default_rng(seed)
+    pixels = (rng.random((size[1] // 10, size[0] // 10, 3)) * 255).astype("uint8")
+    return Image.fromarray(pixels).resize(size)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def test_dhash_is_stable_under_resize():
+    img = noise_image(0)
+    assert hamming(dhash(img), dhash(img.resize((200, 150)))) <= 6
+
+
+def test_dhash_separates_different_images():
+    assert hamming(dhash(noise_image(0)), dhash(noise_image(1))) > 6
+
+
+def png_bytes(img):
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_fit_image_keeps_images_within_limit():
+    data = png_bytes(noise_image(0))
+    assert fit_image(data, len(data)) == (data, "png")
+
+
+def test_fit_image_reencodes_oversized_images():
+    rng = np.random.default_rng(0)
+    img = Image.fromarray((rng.random((600, 600, 3)) * 255).astype("uint8"))
+    data = png_bytes(img)
+    limit = len(data) // 10
+
+    fitted, extension = fit_image(data, limit)
+    assert extension == "jpg"
+    assert len(fitted) <= limit
+    assert Image.open(BytesIO(fitted)).format == "JPEG"
@@ -0,0 +1,98 @@
+from io import BytesIO
+
+import discord
+import numpy as np
+from PIL import Image
+
+from utils.payload_builder import (
+    EMBED_DESCRIPTION_LIMIT,
+    EMBED_TITLE_LIMIT,
+    EMBED_TOTAL_LIMIT,
+    PayloadBuilder,
+    _embed_length,
+    fit_embed,
+)
+
+
+def make_embed(title="A post", description="New post by someone"):
+    return discord.Embed(
+        title=title, description=description, url="https://i.redd.it/a.jpg"
+    )
+
+
+def test_fit_embed_truncates_title_and_description():
+    embed = fit_embed({"title": "t" * 300, "description": "d" * 5000})
+    assert len(embed["title"]) == EMBED_TITLE_LIMIT
+    assert len(embed["description"]) == EMBED_DESCRIPTION_LIMIT
+    assert embed["title"].endswith("…")
+
+
+def test_fit_embed_counts_every_field_toward_total():
+    embed = {
+        "title": "t" * 200,
+        "description": "d" * 4000,
+        "footer": {"text": "f" * 1000},
+        "fields": [{"name": "n", "value": "v" * 1000} for _ in range(2)],
+    }
+    fit_embed(embed)
+    assert _embed_length(embed) <= EMBED_TOTAL_LIMIT
+    assert len(embed["fields"]) == 2
+
+
+def test_fit_embed_leaves_small_embeds_alone():
+    embed = {"title": "A post", "description": "New post by someone"}
+    assert fit_embed(dict(embed)) == embed
+
+
+def test_payload_attachment_is_reusable_across_sends():
+    builder = PayloadBuilder()
+    payload = builder.build("p1", make_embed(), b"\x89PNG fake data")
+
+    first = payload.to_kwargs()
+    second = payload.to_kwargs()
+    assert first["file"].fp.read() == second["file"].fp.read() == b"\x89PNG fake data"
+    assert first["file"].filename == "combined.png"
+    assert first["embed"].image.url == "attachment://combined.png"
+
+
+def test_payload_without_attachment_has_no_file():
+    payload = PayloadBuilder().build("p1", make_embed())
+    assert set(payload.to_kwargs()) == {"embed"}
+
+
+def test_payload_is_kept_until_confirmed():
+    builder = PayloadBuilder()
+    payload = builder.build("p1", make_embed(), fingerprints={0: [1]})
+    assert builder.get("p1") is payload
+    builder.confirm("p1")
+    assert builder.get("p1") is None
+
+
+def test_oldest_payload_is_evicted():
+    builder = PayloadBuilder(max_pending=2)
+    for post_id in ("p1", "p2", "p3"):
+        builder.build(post_id, make_embed())
+    assert builder.get("p1") is None
+    assert builder.get("p3") is not None
+
+
+def test_shrink_halves_the_attachment():
+    rng = np.random.default_rng(0)
+    img = Image.fromarray((rng.random((400, 400, 3)) * 255).astype("uint8"))
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    data = buf.getvalue()
+    builder = PayloadBuilder()
+    payload = builder.build("p1", make_embed(), data, max_attachment_bytes=len(data))
+
+    assert builder.shrink("p1")
+    assert len(payload.attachment) <= len(data) // 2
+    assert payload.filename == "combined.jpg"
+    assert payload.to_kwargs()["embed"].image.url == "attachment://combined.jpg"
+
+
+def test_shrink_without_attachment_does_nothing():
+    builder = PayloadBuilder()
+    builder.build("p1", make_embed())
+    assert not builder.shrink("p1")
+    assert not builder.shrink("missing")
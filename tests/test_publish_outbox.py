@@ -0,0 +1,105 @@
+import json
+
+from utils.publish_outbox import PublishOutbox
+
+
+def make_entry(post_id):
+    return {"id": post_id, "title": f"title {post_id}", "author": "someone"}
+
+
+def test_load_rebuilds_outstanding_states(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    outbox = PublishOutbox(str(path))
+    outbox.mark_pending(make_entry("a"), "https://i.redd.it/a.jpg", "content")
+    outbox.mark_sent("a")
+    outbox.mark_pending(make_entry("b"), "https://i.redd.it/b.jpg", "content")
+    outbox.mark_pending(make_entry("c"), "https://i.redd.it/c.jpg", "content")
+    outbox.mark_sent("c")
+    outbox.mark_committed("c")
+    outbox.mark_pending(make_entry("d"), "https://i.redd.it/d.jpg", "content")
+    outbox.discard("d")
+
+    reloaded = PublishOutbox(str(path))
+    assert reloaded.sent_entries() == [make_entry("a")]
+    assert reloaded.pending_entries() == [
+        {**make_entry("b"), "link": "https://i.redd.it/b.jpg", "content": "content"}
+    ]
+
+
+def test_discard_is_logged_separately_from_commit(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    outbox = PublishOutbox(str(path))
+    outbox.mark_pending(make_entry("a"), "https://i.redd.it/a.jpg", "content")
+    outbox.discard("a")
+
+    states = [json.loads(line)["state"] for line in path.read_text().splitlines()]
+    assert states == ["pending", "discarded"]
+
+
+def test_torn_last_line_is_ignored_and_repaired(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    outbox = PublishOutbox(str(path))
+    outbox.mark_pending(make_entry("a"), "https://i.redd.it/a.jpg", "content")
+    outbox.mark_sent("a")
+    with open(path, mode="a", encoding="utf-8") as file:
+        file.write('{"id": "b", "sta')
+
+    reloaded = PublishOutbox(str(path))
+    assert reloaded.sent_entries() == [make_entry("a")]
+    reloaded.mark_committed("a")
+    assert PublishOutbox(str(path)).entries == {}
+
+
+def test_compact_keeps_only_outstanding_records(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    outbox = PublishOutbox(str(path))
+    for post_id in ("a", "b"):
+        outbox.mark_pending(
+            make_entry(post_id), f"https://i.redd.it/{post_id}.jpg", "content"
+        )
+        outbox.mark_sent(post_id)
+    outbox.mark_committed("a")
+    outbox.compact()
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["id"] == "b"
+    assert PublishOutbox(str(path)).sent_entries() == [make_entry("b")]
+
+
+def test_is_pending_until_sent_or_discarded(tmp_path):
+    outbox = PublishOutbox(str(tmp_path / "outbox.jsonl"))
+    outbox.mark_pending(make_entry("a"), "https://i.redd.it/a.jpg", "content")
+    outbox.mark_pending(make_entry("b"), "https://i.redd.it/b.jpg", "content")
+    assert outbox.is_pending("a") and outbox.is_pending("b")
+
+    outbox.mark_sent("a")
+    outbox.discard("b")
+    assert not outbox.is_pending("a")
+    assert not outbox.is_pending("b")
+    assert not outbox.is_pending("missing")
+
+
+def test_failed_posts_survive_reload_with_their_content(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    outbox = PublishOutbox(str(path))
+    outbox.mark_pending(make_entry("a"), "https://i.redd.it/a.jpg", "**Title** a")
+    outbox.mark_failed("a")
+    outbox.compact()
+
+    reloaded = PublishOutbox(str(path))
+    assert reloaded.failed_entries() == [{"id": "a", "content": "**Title** a"}]
+    assert not reloaded.is_pending("a")
+    reloaded.discard("a")
+    assert PublishOutbox(str(path)).failed_entries() == []
+
+
+def test_fingerprints_round_trip_with_integer_kinds(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    outbox = PublishOutbox(str(path))
+    fingerprints = {0: [2**63 + 5], 1: [], 2: [42]}
+    outbox.mark_pending(make_entry("a"), "https://i.redd.it/a.jpg", "c", fingerprints)
+    outbox.mark_sent("a")
+
+    assert PublishOutbox(str(path)).fingerprints("a") == fingerprints
+    assert outbox.fingerprints("missing") == {}
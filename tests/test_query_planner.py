@@ -0,0 +1,92 @@
+from utils.query_planner import (
+    BATCHED_SEARCH,
+    MULTIREDDIT,
+    PER_SUBREDDIT,
+    QueryPlanner,
+)
+
+STRATEGIES = [MULTIREDDIT, BATCHED_SEARCH, PER_SUBREDDIT]
+
+
+def measure_all(planner, results):
+    """Run the first cycles, where each strategy is tried once."""
+    for _ in planner.strategies:
+        strategy = planner.choose()
+        planner.record(strategy, *results[strategy])
+
+
+def test_every_strategy_is_tried_first():
+    planner = QueryPlanner(STRATEGIES)
+    tried = []
+    for _ in STRATEGIES:
+        strategy = planner.choose()
+        tried.append(strategy)
+        planner.record(strategy, 1, 0.1, 0)
+    assert tried == STRATEGIES
+
+
+def test_cheapest_strategy_wins_when_nothing_is_new():
+    planner = QueryPlanner(STRATEGIES)
+    measure_all(
+        planner,
+        {
+            MULTIREDDIT: (1, 0.2, 0),
+            BATCHED_SEARCH: (1, 0.5, 0),
+            PER_SUBREDDIT: (3, 0.9, 0),
+        },
+    )
+    assert planner.choose() == MULTIREDDIT
+
+
+def test_new_posts_do_not_affect_the_choice():
+    planner = QueryPlanner(STRATEGIES)
+    measure_all(
+        planner,
+        {
+            # the first strategy run after startup sees the whole backlog
+            MULTIREDDIT: (1, 0.5, 40),
+            BATCHED_SEARCH: (1, 0.2, 0),
+            PER_SUBREDDIT: (3, 0.9, 0),
+        },
+    )
+    assert planner.choose() == BATCHED_SEARCH
+
+
+def test_costs_are_smoothed():
+    planner = QueryPlanner([MULTIREDDIT, PER_SUBREDDIT])
+    measure_all(planner, {MULTIREDDIT: (1, 0.2, 0), PER_SUBREDDIT: (2, 0.2, 0)})
+    # one slow cycle doesn't flip the choice on its own
+    planner.choose()
+    planner.record(MULTIREDDIT, 1, 1.2, 0)
+    assert planner.choose() == MULTIREDDIT
+
+
+def test_least_recently_measured_strategy_is_re_explored():
+    planner = QueryPlanner(STRATEGIES, explore_every=5)
+    measure_all(
+        planner,
+        {
+            MULTIREDDIT: (1, 0.2, 0),
+            BATCHED_SEARCH: (1, 0.5, 0),
+            PER_SUBREDDIT: (3, 0.9, 0),
+        },
+    )
+    chosen = []
+    while planner.cycle < 5:
+        strategy = planner.choose()
+        chosen.append(strategy)
+        planner.record(strategy, 1, 0.2, 0)
+    assert chosen == [MULTIREDDIT, BATCHED_SEARCH]
+
+
+def test_record_reports_the_cycle():
+    planner = QueryPlanner([MULTIREDDIT])
+    strategy = planner.choose()
+    report = planner.record(strategy, 4, 1.5, 3)
+    assert report == {
+        "strategy": MULTIREDDIT,
+        "requests": 4,
+        "new_posts": 3,
+        "elapsed": 1.5,
+    }
+    assert planner.last_report == report